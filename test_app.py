@@ -0,0 +1,138 @@
+import io
+
+import orjson
+import pytest
+import requests
+
+import app
+
+
+def stream(text, size=1):
+    raw = []
+    shown = "".join(app._stream_first_question((text[i:i + size] for i in range(0, len(text), size)), raw))
+    return shown, "".join(raw)
+
+
+def test_streams_first_question_of_json_object():
+    text = '{"questions": ["What is the \\"GIL\\"?\\nWhy?", "Q2?"]}'
+    for size in (1, 3, len(text)):
+        shown, raw = stream(text, size)
+        assert shown == 'What is the "GIL"?\nWhy?'
+        assert raw == text
+
+
+def test_decodes_unicode_escapes_and_surrogate_pairs():
+    text = '{ "questions" : [ "Caf\\u00e9 \\ud83d\\ude00?" ] }'
+    shown, _ = stream(text)
+    assert shown == "Café 😀?"
+    assert shown == orjson.loads(text)["questions"][0]
+
+
+def test_ignores_brackets_in_prose():
+    text = 'Here are your questions: ["What is a closure?", "Q2?"] Good luck!'
+    shown, raw = stream(text)
+    assert shown == ""
+    assert raw == text
+
+
+def test_bare_array_is_not_streamed():
+    shown, _ = stream('["Q1?", "Q2?"]')
+    assert shown == ""
+
+
+def sse_response(*events):
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.headers["Content-Type"] = "text/event-stream"
+    resp.raw = io.BytesIO(b"".join(b"data: " + e + b"\n\n" for e in events))
+    return resp
+
+
+def stream_from(monkeypatch, resp):
+    class Session:
+        def post(self, *args, **kwargs):
+            return resp
+    monkeypatch.setattr(app, "OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(app, "_http", lambda: Session())
+    return "".join(app.stream_openrouter_chat([{"role": "user", "content": "hi"}]))
+
+
+def delta(text):
+    return orjson.dumps({"choices": [{"delta": {"content": text}}]})
+
+
+def test_stream_decodes_utf8_without_charset(monkeypatch):
+    resp = sse_response(delta("Café — "), delta("naïve?"), b"[DONE]")
+    assert stream_from(monkeypatch, resp) == "Café — naïve?"
+
+
+def test_stream_stops_on_error_event(monkeypatch, caplog):
+    error = orjson.dumps({"error": {"code": 502, "message": "upstream down"}})
+    resp = sse_response(delta("Partial"), error, delta(" never seen"))
+    assert stream_from(monkeypatch, resp) == "Partial"
+    assert "upstream down" in caplog.text
+
+
+def test_truncated_reply_keeps_only_closed_questions():
+    text = '{"questions": ["What is a Python decorator?", "How does Django ORM handle N+1'
+    assert app._extract_questions_from_text(text) == (["What is a Python decorator?"], False)
+    pretty = '{\n  "questions": [\n    "What is a Python decorator?",\n    "How does Dja'
+    assert app._extract_questions_from_text(pretty) == (["What is a Python decorator?"], False)
+
+
+def truncated_reply(finish_reason):
+    def stream(*args, outcome=None, **kwargs):
+        if finish_reason:
+            outcome["finish_reason"] = finish_reason
+        yield '{"questions": ["What is a Python decorator?", "How does Dja'
+    return stream
+
+
+def test_truncated_reply_is_not_cached(monkeypatch):
+    # Stream dropped without a finish_reason: show what closed, but don't cache it
+    monkeypatch.setattr(app, "stream_openrouter_chat", truncated_reply(None))
+    assert app.render_questions_for_stack("Python, Django", n=3) == ["What is a Python decorator?"]
+    assert app._cached_questions(app._normalize_stack("Python, Django"), 3) is None
+
+
+def test_length_cutoff_is_a_failed_generation(monkeypatch):
+    monkeypatch.setattr(app, "stream_openrouter_chat", truncated_reply("length"))
+    assert app.render_questions_for_stack("Go, gRPC", n=3) == []
+    assert app._cached_questions(app._normalize_stack("Go, gRPC"), 3) is None
+
+
+def test_failed_save_does_not_advance_cursor(monkeypatch):
+    def disk_full(filename, content):
+        raise OSError("disk full")
+    messages = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    monkeypatch.setattr(app, "_append_saved", disk_full)
+    app.st.session_state.save_cursor = 0
+    with pytest.raises(OSError):
+        app.save_conversation(messages)
+    assert app.st.session_state.save_cursor == 0
+
+    written = []
+    monkeypatch.setattr(app, "_append_saved", lambda filename, content: written.append(content))
+    content = app.save_conversation(messages)
+    assert written == [content]
+    assert content.startswith(f"session: {app.st.session_state.session_id}\nuser: hi\n")
+    assert app.st.session_state.save_cursor == 2
+
+
+def test_retry_after_is_clamped():
+    resp = requests.Response()
+    resp.status_code = 429
+    resp.headers["Retry-After"] = "-5"
+    assert app._retry_wait(1, 1.25, resp) == 0.0
+    resp.headers["Retry-After"] = "120"
+    assert app._retry_wait(1, 1.25, resp) == app.MAX_RETRY_WAIT
+
+
+def test_save_file_reopens_after_delete(tmp_path):
+    path = tmp_path / "candidate_data.txt"
+    save = app._SaveFile(path)
+    save.append("first\n")
+    path.unlink()
+    save.append("second\n")
+    assert path.read_text(encoding="utf-8") == "second\n"
+    save.fh.close()